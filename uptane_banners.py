@@ -18,55 +18,119 @@
 
 """
 import os
+import sys
 import time
+import signal
+import shutil
+import pathlib
 import textwrap
+import functools
+import collections
 from uptane_sounds import (play,
   TADA, WON, LOST, LOST2, SATAN, WITCH, DOOMED, ICE, ICE2)
-from subprocess import Popen, call, PIPE
 
-# Bash font color escape sequences
-RED = "\033[31m"
-GREEN = "\033[32m"
-YELLOW = "\033[33m"
-BLUE = "\033[34m"
-MAGENTA = "\033[35m"
-CYAN = "\033[36m"
-WHITE = "\033[97m"
+# Bash font color escape sequences, pre-encoded so frames can be written to
+# the binary stdout buffer without a text codec pass
+RED = b"\033[31m"
+GREEN = b"\033[32m"
+YELLOW = b"\033[33m"
+BLUE = b"\033[34m"
+MAGENTA = b"\033[35m"
+CYAN = b"\033[36m"
+WHITE = b"\033[97m"
 
 # Bash background color escape sequences
-BLACK_BG = "\033[40m"
-BLUE_BG = "\033[44m"
-WHITE_BG = "\033[107m"
-GRAY_BG = "\033[100m"
-RED_BG = "\033[41m"
-MAGENTA_BG = "\033[45m"
-GREEN_BG = "\033[42m"
-YELLOW_BG = "\033[43m"
+BLACK_BG = b"\033[40m"
+BLUE_BG = b"\033[44m"
+WHITE_BG = b"\033[107m"
+GRAY_BG = b"\033[100m"
+RED_BG = b"\033[41m"
+MAGENTA_BG = b"\033[45m"
+GREEN_BG = b"\033[42m"
+YELLOW_BG = b"\033[43m"
+
+RESET_COLOR = b'\033[0m'
+
+# Cached terminal size, invalidated on window resize (SIGWINCH)
+_SIZE = None
+
+def _invalidate_screen_size(signum=None, frame=None):
+  """Drops the cached terminal size and pre-rendered banners, e.g. on
+  window resize. """
+  global _SIZE
+  _SIZE = None
+  _render_banner.cache_clear()
+
+signal.signal(signal.SIGWINCH, _invalidate_screen_size)
 
-RESET_COLOR = '\033[0m'
 
 def get_screen_size():
-  """Calls bash command `stty size` and returns standard output, i.e.
-  width and height of current terminal (blocking call). """
-  process = Popen('stty size', shell=True, stdout=PIPE)
-  process.wait()
-  rows, cols = process.stdout.read().split()
-  return int(rows), int(cols)
+  """Returns width and height of current terminal, querying the terminal
+  (COLUMNS/LINES environment or ioctl, falling back to 80x24) only on first
+  call and after a window resize. """
+  global _SIZE
+  if _SIZE is None:
+    cols, rows = shutil.get_terminal_size((80, 24))
+    _SIZE = (rows, cols)
+  return _SIZE
 
 
 def clear_screen():
-  """Calls bash command `clear`, clears the current terminal (blocking call). """
-  call('clear')
+  """Clears the current terminal by writing ANSI escape sequences (cursor
+  home, erase screen, erase scrollback) directly to stdout. """
+  sys.stdout.buffer.write(b"\x1b[H\x1b[2J\x1b[3J")
+  sys.stdout.buffer.flush()
 
 
+# Banner lines plus their precomputed width (length of the longest line)
+Banner = collections.namedtuple("Banner", ["lines", "width"])
+
+@functools.lru_cache(maxsize=None)
 def load_banner(file_path):
-  """Loads text from file, appends each line to an array and returns array. """
-  banner = open(file_path, 'r').read()
-  return banner.split("\n")
+  """Loads text from file and returns it as a Banner namedtuple of byte lines
+  and width, reading each file only once. """
+  lines = tuple(pathlib.Path(file_path).read_bytes().splitlines())
+  return Banner(lines, max(map(len, lines)))
+
+
+@functools.lru_cache(maxsize=64)
+def _render_banner(banner, cols, color, color_bg):
+  """Renders the passed Banner into a single string of horizontally centered
+  and optionally colored lines, cached per banner, terminal width and color
+  combination. """
+  if banner.width > cols:
+    raise Exception("Banner width exceeds terminal width.")
+
+  # Halve with a shift to stay on the integer fast path
+  left_fill = (cols - banner.width) >> 1
+
+  prefix = (color_bg or b"") + (color or b"")
+  suffix = RESET_COLOR if prefix else b""
+
+  # Left padding is the same for every line, right padding is done by ljust
+  # (for alignment and background color)
+  left = b" " * left_fill
+
+  out = []
+  for line in banner.lines:
+    out.append(prefix + left + line.ljust(cols - left_fill) + suffix + b"\n")
+
+  return b"".join(out)
+
+
+@functools.lru_cache(maxsize=64)
+def _prepare_text(text, width):
+  """Splits the passed text at line breaks and wraps each line to the passed
+  width, cached per text and width pair. """
+  wrapper = textwrap.TextWrapper(width=width, break_long_words=False)
+  lines = []
+  for line in text.splitlines():
+    lines += wrapper.wrap(line)
+  return tuple(lines)
 
 
 
-def print_banner(banner_array, show_for=False, color=False, color_bg=False,
+def print_banner(banner, show_for=False, color=False, color_bg=False,
     text=False, sound=False):
   """
   <Purpose>
@@ -79,13 +143,14 @@ def print_banner(banner_array, show_for=False, color=False, color_bg=False,
 
 
   <Arguments>
-    banner_array:
-      Array of string (lines to print)
+    banner:
+      Banner namedtuple (lines to print plus width), as returned by
+      load_banner
 
     show_for: (optional)
       If passed, sleep for given time (in seconds) and then clears the screen.
-      Note, if a sound is passed as well, the show_for time is added to the
-      duration of the sound
+      Note, if a sound is passed as well, it plays while the banner is shown
+      and the screen is cleared when both sleep and sound have finished
 
     color: (optional)
       If passed, fills the banner font. Use one of the constants above.
@@ -94,14 +159,15 @@ def print_banner(banner_array, show_for=False, color=False, color_bg=False,
       If passed, fills the banner background. Use one of the constants above.
 
     text: (optional)
-      Text to be displayed below the banner. Can be a string or a list.
-      If it is a string the lines are split at "\n". Additionally the text
-      is wrapped to fit the width of the current terminal minus a hard-coded
-      margin.
+      Text to be displayed below the banner, as a string whose lines are
+      split at "\n". Additionally the text is wrapped to fit the width of
+      the current terminal minus a hard-coded margin (cached per text and
+      width).
 
     sound: (optional)
       If passed and one of the required command line player can be found,
-      the sound is played in a subprocess at the passed path (blocking).
+      the sound is played in a subprocess at the passed path (blocking,
+      unless show_for is passed as well).
 
   <Exceptions>
     Exception if banner width exceeds terminal width
@@ -115,86 +181,83 @@ def print_banner(banner_array, show_for=False, color=False, color_bg=False,
   """
 
   rows, cols = get_screen_size()
-  content_height = 0
 
-  # Get left padding
-  banner_width = len(max(banner_array, key=len))
-
-  if banner_width > cols:
-    raise Exception("Banner width exceeds terminal width.")
-  elif banner_width == cols:
-    left_fill = 0
-  else:
-    left_fill = int((cols - banner_width) / 2)
+  # Pre-rendered banner block from the cache
+  banner_block = _render_banner(banner, cols, color, color_bg)
 
   clear_screen()
 
-  # Print banner, horizontally left and right padded
-  for line in banner_array:
-    right_fill = cols - left_fill - len(line)
-    # Right and left fill with spaces (for alignment and background color)
-    output = (left_fill * " ") + line + (right_fill * " ")
-    if color:
-      output = color + output
-
-    if color_bg:
-      output = color_bg + output
-
-    if color or color_bg:
-      output += RESET_COLOR
-
-    print(output)
+  # Accumulate the whole frame and flush it with a single write below
+  out = [banner_block]
 
-  # Text can be a list or an \n separated string
-  text_array = []
+  # Split and wrapped text lines come from the cache
+  text_array = ()
   if text:
     margin_len = 10
-    if not isinstance(text, list):
-      text = text.split("\n")
-
-    # Wrap line if it is too long
-    for line in text:
-      text_array += textwrap.wrap(line, cols - 2 * margin_len)
+    output_width = cols - 2 * margin_len
+    text_array = _prepare_text(text, output_width)
 
     # Raise exception if banner and text exceed terminal height
-    if len(banner_array) + len(text_array) > rows:
+    if len(banner.lines) + len(text_array) > rows:
       raise Exception("Text exceeds terminal height.")
 
-    for output in text_array:
-      output_width = cols - 2 * margin_len
-      margin = " " * margin_len
-
-      if color_bg:
-        margin = (color_bg + margin + RESET_COLOR)
-
-      output = "{margin}{output:^{width}}{margin}".format(
-          margin=margin,
-          output=output,
-          width=output_width)
+    # Margins are the same for every line, build them once
+    margin = b" " * margin_len
+    if color_bg:
+      margin = color_bg + margin + RESET_COLOR
 
-      print(output)
+    for line in text_array:
+      out.append(margin + line.encode().center(output_width) + margin + b"\n")
 
 
-  # Fill bottom if color_bg is specified
+  # Fill bottom if color_bg is specified, as one multiplied block
   if color_bg:
-    for i in range(rows - (len(banner_array) + len(text_array)) - 1):
-      print(color_bg + cols * " " + RESET_COLOR)
-
+    remaining = rows - (len(banner.lines) + len(text_array)) - 1
+    if remaining > 0:
+      out.append((color_bg + cols * b" " + RESET_COLOR + b"\n") * remaining)
+
+  # Emit the frame with a single write(2), bypassing Python's buffered IO
+  frame = b"".join(out)
+  try:
+    os.write(sys.stdout.fileno(), frame)
+  except BlockingIOError:
+    sys.stdout.buffer.write(frame)
+    sys.stdout.buffer.flush()
+
+  sound_proc = None
   if sound:
-    play(sound, True)
+    # Play non-blocking if we sleep below anyway, so both waits overlap
+    sound_proc = play(sound, blocking=not show_for)
 
   if show_for:
     time.sleep(show_for)
+    if sound_proc:
+      sound_proc.wait()
     clear_screen()
 
 
-BANNER_UPDATED = load_banner("ascii/updated.txt")
-BANNER_DEFENDED = load_banner("ascii/defended.txt")
-BANNER_FROZEN = load_banner("ascii/frozen.txt")
-BANNER_HACKED = load_banner("ascii/hacked.txt")
-BANNER_COMPROMISED = load_banner("ascii/compromised.txt")
-BANNER_REPLAY = load_banner("ascii/replay.txt")
-BANNER_NO_UPDATE_NEEDED = load_banner("ascii/no_update_needed.txt")
+# Banner files behind the lazily loaded BANNER_* module attributes
+_BANNER_FILES = {
+    "BANNER_UPDATED": "ascii/updated.txt",
+    "BANNER_DEFENDED": "ascii/defended.txt",
+    "BANNER_FROZEN": "ascii/frozen.txt",
+    "BANNER_HACKED": "ascii/hacked.txt",
+    "BANNER_COMPROMISED": "ascii/compromised.txt",
+    "BANNER_REPLAY": "ascii/replay.txt",
+    "BANNER_NO_UPDATE_NEEDED": "ascii/no_update_needed.txt",
+}
+
+def __getattr__(name):
+  """Loads BANNER_* module attributes on first access (PEP 562), so importing
+  this module does not read any banner file. """
+  try:
+    file_path = _BANNER_FILES[name]
+  except KeyError:
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+  banner = globals()[name] = load_banner(file_path)
+  return banner
+
 
 def main():
 
@@ -204,13 +267,17 @@ cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidatat noncil
 cillum dolore eu fugiat nulla pariatur. Excepteur sint occaecat cupidattttat non
 proident, sunt in culpa qui officia deserunt mollit anim id est laborum."""
 
-  print_banner(BANNER_UPDATED, color=GREEN, text=text, sound=WON)
-  print_banner(BANNER_DEFENDED, color=BLUE, color_bg=YELLOW_BG, text=text, sound=TADA)
-  print_banner(BANNER_FROZEN, color=CYAN, color_bg=GRAY_BG, sound=ICE)
-  print_banner(BANNER_COMPROMISED, color=RED, color_bg=BLACK_BG, sound=SATAN)
-  print_banner(BANNER_HACKED, color=RED, color_bg=BLACK_BG, text=text, sound=DOOMED)
-  print_banner(BANNER_REPLAY, color=RED, color_bg=BLACK_BG, sound=WITCH)
-  print_banner(BANNER_NO_UPDATE_NEEDED, color=RED, color_bg=BLACK_BG, show_for=3)
+  # Plain global lookups bypass module __getattr__, go through the module
+  # object so the BANNER_* attributes are loaded lazily
+  banners = sys.modules[__name__]
+
+  print_banner(banners.BANNER_UPDATED, color=GREEN, text=text, sound=WON)
+  print_banner(banners.BANNER_DEFENDED, color=BLUE, color_bg=YELLOW_BG, text=text, sound=TADA)
+  print_banner(banners.BANNER_FROZEN, color=CYAN, color_bg=GRAY_BG, sound=ICE)
+  print_banner(banners.BANNER_COMPROMISED, color=RED, color_bg=BLACK_BG, sound=SATAN)
+  print_banner(banners.BANNER_HACKED, color=RED, color_bg=BLACK_BG, text=text, sound=DOOMED)
+  print_banner(banners.BANNER_REPLAY, color=RED, color_bg=BLACK_BG, sound=WITCH)
+  print_banner(banners.BANNER_NO_UPDATE_NEEDED, color=RED, color_bg=BLACK_BG, show_for=3)
 
 
 
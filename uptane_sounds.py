@@ -71,11 +71,12 @@ def play(sound_path, blocking=False):
     Starts subprocess and executes command line audio player
 
   <Returns>
-    None
+    The player subprocess object, or None if the sound file or a player
+    could not be found
   """
   if not os.path.isfile(sound_path):
     print("Sound '{}' not found.".format(sound_path))
-    return
+    return None
 
   if _on_path("omxplayer"):
     player = "omxplayer"
@@ -85,14 +86,15 @@ def play(sound_path, blocking=False):
 
   else:
     print("No player found on this platform.")
-    return
+    return None
 
-  cmd = [player, sound_path]
   proc = Popen([player, sound_path], stdout=PIPE, stderr=PIPE)
 
   if blocking:
     proc.wait()
 
+  return proc
+
 
 def main():
   play(TADA, True)